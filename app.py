@@ -1,23 +1,26 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import numpy as np
 import time
-import random
 from datetime import datetime, timedelta
-import urllib.parse
 import plotly.express as px
-from google import genai
-import json
-import os
-from dotenv import load_dotenv
-import re
 
-load_dotenv()
-# --- CONFIGURATION ---
-# Access API key from secrets or use empty string for simulation mode
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+from engine import (
+    BATCH_SIZE, CACHE_TTL, DERIVE_PRICES, GEMINI_API_KEY, GENRES, METRICS_PATH, PREWARM_RPM, REGIONS, ROUTER_HEDGE, Trace,
+    forecast_protocol, gemini_search_protocol, gemini_stream_protocol, get_model_router, get_prewarmer,
+    get_price_history, get_pricing_table, get_result_cache, get_title_index, get_single_flight, get_telemetry, simulation_protocol, sweep_protocol,
+)
+from fetcher import get_live_fetcher
+from render import (
+    chart_frame, gem_cards_html, hub_card_html, hub_cards_html, page, page_count, terminal_line,
+)
+
+# Median forecast lines drawn on the Predictive Trend chart
+FORECAST_LINES = 12
+# Window of stored observations charted by Price History
+HISTORY_DAYS = 180
+# Cards shown for a title search
+SEARCH_RESULTS = 9
 
 # --- SOFTWARE ARCHITECTURE CONFIG ---
 st.set_page_config(
@@ -85,6 +88,7 @@ st.markdown("""
     .node-label { color: #94a3b8; font-size: 0.75rem; font-weight: 800; text-transform: uppercase; letter-spacing: 2px; }
     .node-value { font-size: 1.8rem; font-weight: 800; margin-top: 10px; color: white; }
     
+    .card-grid { display: grid; grid-template-columns: repeat(3, minmax(0, 1fr)); gap: 0 15px; }
     .hub-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 10px; margin-top: 15px; }
     
     /* Dynamic Buttons */
@@ -107,157 +111,18 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- BACKEND LOGIC ---
-def get_prediction(price):
-    days = [datetime.now() + timedelta(days=i) for i in range(1, 8)]
-    forecast = [price]
-    for _ in range(1, 8):
-        volatility = random.uniform(-0.06, 0.06)
-        forecast.append(forecast[-1] * (1 + volatility))
-    return days, forecast[1:]
-
-def get_market_links(title, region_code):
-    q = urllib.parse.quote(f"{title} book")
-    if "UK" in region_code:
-        return (f"https://www.amazon.co.uk/s?k={q}", f"https://www.ebay.co.uk/sch/i.html?_nkw={q}", "AMAZON.CO.UK", "EBAY.UK")
-    elif "USA" in region_code:
-        return (f"https://www.amazon.com/s?k={q}", f"https://www.ebay.com/sch/i.html?_nkw={q}", "AMAZON.COM", "EBAY.US")
-    else:
-        return (f"https://www.amazon.in/s?k={q}", f"https://www.flipkart.com/search?q={q}", "AMAZON.IN", "FLIPKART")
-
-@st.cache_data(show_spinner="Neural Engine is analyzing market data...", ttl=3600)
-def gemini_search_protocol(api_key, genre, region_code, currency_symbol):
-    try:
-        # 1. Define the prompt FIRST so it is defined before use
-        prompt = f"""
-        Act as a pricing engine. Identify 6 REAL, trending '{genre}' books (Bestsellers 2023-2025).
-        For each, estimate the CURRENT market price (Paperback) in {currency_symbol} for the {region_code} market.
-        Return ONLY a raw JSON list. No markdown.
-        Format: [ {{ "Title": "Book Title", "Price": 14.99, "Rating": 5 }} ]
-        """
-        
-        client = genai.Client(api_key=api_key)
-        
-        # 2. Model Fallback Logic: Try 2.5 first, then 1.5 if rate limited
-        models_to_try = ["gemini-2.5-flash", "gemini-1.5-flash"]
-        
-        for m_id in models_to_try:
-            try:
-                response = client.models.generate_content(model=m_id, contents=prompt)
-                
-                if response and response.text:
-                    # Clean the JSON response
-                    text_data = re.sub(r'```json\n|\n```', '', response.text).strip()
-                    data = json.loads(text_data)
-                    
-                    enhanced_db = []
-                    for item in data:
-                        link1, link2, label1, label2 = get_market_links(item['Title'], region_code)
-                        enhanced_db.append({
-                            "Title": item['Title'], 
-                            "Price": float(item['Price']), 
-                            "Rating": int(item['Rating']),
-                            "Link1": link1, "Link2": link2, 
-                            "Label1": label1, "Label2": label2
-                        })
-                    return enhanced_db
-            
-            except Exception as e:
-                # If we hit a rate limit (429), try the next model
-                if "429" in str(e):
-                    continue 
-                else:
-                    raise e
-        
-    except Exception as e:
-        st.error(f"Neural Engine Final Error: {e}")
-        return None
-
-def simulation_protocol(genre, region_code):
-    """
-    REALISTIC FALLBACK: 
-    Instead of scraping fake sites (which have fake high prices), 
-    we return a database of REAL books with REALISTIC prices.
-    """
-    
-    # Static DB of real bestsellers to ensure pricing accuracy when API fails
-    library = {
-        "Science Fiction": [
-            ("Dune", 18.00), ("Project Hail Mary", 16.50), ("Neuromancer", 14.00), 
-            ("The Three-Body Problem", 17.00), ("Snow Crash", 15.50), ("Dark Matter", 16.00)
-        ],
-        "Business": [
-            ("Atomic Habits", 20.00), ("Deep Work", 15.00), ("Zero to One", 14.00),
-            ("Psychology of Money", 16.00), ("Rich Dad Poor Dad", 9.00), ("Thinking, Fast and Slow", 14.50)
-        ],
-        "Mystery": [
-            ("The Silent Patient", 12.00), ("Gone Girl", 11.00), ("The Girl with the Dragon Tattoo", 10.00),
-            ("Big Little Lies", 13.00), ("Sharp Objects", 11.50)
-        ],
-        "Fiction": [
-            ("The Midnight Library", 13.00), ("The Alchemist", 12.00), ("Klara and the Sun", 14.00),
-            ("Where the Crawdads Sing", 11.00), ("Circe", 13.50)
-        ],
-        "Fantasy": [
-            ("Harry Potter and the Sorcerer's Stone", 12.00), ("The Hobbit", 14.00), ("A Game of Thrones", 16.00),
-            ("The Name of the Wind", 15.00), ("Fourth Wing", 18.00)
-        ],
-        "Self Help": [
-            ("The Subtle Art of Not Giving a F*ck", 14.00), ("How to Win Friends...", 13.00), 
-            ("The 4-Hour Workweek", 15.00), ("Can't Hurt Me", 17.00)
-        ],
-        "History": [
-            ("Sapiens", 18.00), ("Guns, Germs, and Steel", 16.00), ("The Wager", 17.00),
-            ("Devil in the White City", 15.00)
-        ],
-        "Thriller": [
-            ("The Da Vinci Code", 10.00), ("The Girl on the Train", 11.00), ("Verity", 13.00),
-            ("The Housemaid", 12.00)
-        ],
-        "Romance": [
-            ("It Ends with Us", 14.00), ("Pride and Prejudice", 8.00), ("Book Lovers", 13.00),
-            ("Red, White & Royal Blue", 15.00)
-        ],
-        "Biography": [
-            ("Steve Jobs", 18.00), ("Becoming", 19.00), ("Elon Musk", 20.00), ("Greenlights", 16.00)
-        ],
-        "Technology": [
-            ("The Innovators", 18.00), ("Life 3.0", 16.00), ("Chip War", 19.00), ("Clean Code", 25.00)
-        ],
-        "Philosophy": [
-            ("Meditations", 10.00), ("Beyond Good and Evil", 11.00), ("The Republic", 9.00), ("Sophie's World", 14.00)
-        ]
-    }
-    
-    # Default list if genre not in static DB
-    defaults = [("The Great Gatsby", 10.00), ("1984", 12.00), ("To Kill a Mockingbird", 11.00), ("Animal Farm", 9.00)]
-    books = library.get(genre, defaults)
-    
-    db = []
-    for title, base_usd in books:
-        # Smart Currency Conversion with Purchasing Power Adjustment
-        if region_code == "IN":
-            # Direct convert is too high for books. INR book market is cheaper.
-            # Base * 84 (rate) * 0.4 (PPP adjustment)
-            raw_inr = base_usd * 84 * 0.4 
-            # Round to nearest 9 or 0 (e.g. 499, 500)
-            price = round(raw_inr / 10) * 10 - 1
-            if price < 199: price = 299 # Minimum floor
-        elif region_code == "UK":
-            price = round(base_usd * 0.78, 2)
-        else:
-            # USA
-            price = base_usd + random.choice([0.99, 0.49])
-            
-        link1, link2, label1, label2 = get_market_links(title, region_code)
-        
-        db.append({
-            "Title": title,
-            "Price": price,
-            "Rating": random.choice([4, 5]),
-            "Link1": link1, "Link2": link2, "Label1": label1, "Label2": label2
-        })
-    return db
+# --- UI COMPONENTS ---
+@st.fragment
+def marketplace_hub(df, sym, live_active):
+    # A fragment: paging reruns only the hub, not the fetch above it
+    pages = page_count(len(df))
+    number = st.number_input(f"Page (of {pages}, {len(df):,} assets)", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    shown = page(df, number)
+    if live_active:
+        with get_telemetry().span("live.verify", rows=len(shown)):
+            shown = pd.DataFrame(get_live_fetcher().verify(shown.to_dict('records')))
+    with get_telemetry().span("cards.render", tab="hub", rows=len(shown)):
+        st.markdown(hub_cards_html(shown, sym), unsafe_allow_html=True)
 
 # --- UI HEADER ---
 st.markdown('<h1 style="font-weight:800; font-size:3.5rem; letter-spacing:-4px; margin-bottom:0;">OMNISCRAPER <-> <span style="color:#06b6d4">Online E-Commerce</span></h1>', unsafe_allow_html=True)
@@ -265,201 +130,343 @@ st.markdown('<p class="mono" style="color:#64748b;">>> ENTERPRISE INTELLIGENCE S
   
 with st.sidebar:
     st.markdown("### `NODE SETTINGS`")
-    region = st.selectbox("Intelligence Node", ["India (Asia-South1)", "UK (London)", "USA (Virginia)"], index=0)
+    region = st.selectbox("Intelligence Node", list(REGIONS.keys()), index=0)
     
     # Currency Logic
-    if "UK" in region: 
-        sym, region_code = "£", "UK"
-    elif "USA" in region: 
-        sym, region_code = "$", "USA"
-    else: 
-        sym, region_code = "₹", "IN"
+    sym, region_code = REGIONS[region]
     
     st.divider()
     st.markdown("### `ANALYTICS ENGINE`")
-    viz_mode = st.radio("Intelligence Projection", ["Predictive Trend", "Satisfaction Density", "3D Value Matrix", "Crawl Yield Radial"])
+    viz_mode = st.radio("Intelligence Projection", ["Predictive Trend", "Price History", "Satisfaction Density", "3D Value Matrix", "Crawl Yield Radial"])
     
     st.divider()
     st.markdown("### `ENGINE OVERRIDES`")
     neural_active = st.toggle("Neural Pattern Recognition", value=True)
     blueprint_active = st.toggle("Fixed Blueprint Grid", value=True)
+    stream_active = st.toggle("Streaming Responses", value=True, help="Render books as the model streams them in.")
+    derive_active = st.toggle("USD Base Pricing", value=DERIVE_PRICES,
+                              help="Fetch each segment once in USD and price every node from the FX/PPP table.")
+    if derive_active:
+        st.caption(f"💱 Node prices derived via pricing table v{get_pricing_table().version}")
+    live_active = st.toggle("Live Price Verification", value=False,
+                            help="Fetch the marketplace pages behind the hub cards and show their listed prices.")
 
     # --- ADDED THREADING CONTROLS ---
     st.markdown("### `THREADING CONFIG`")
     use_threading = st.toggle("Hyper-Threading", value=True, help="Enable asynchronous concurrent fetching.")
     threading_level = st.slider("Worker Nodes", min_value=1, max_value=128, value=64, disabled=not use_threading)
+    sweep_all = st.toggle("All Segments Sweep", value=False, help="Fetch every segment across every node in one run.")
+    batch_size = st.slider("Genres per Prompt", min_value=1, max_value=10, value=BATCH_SIZE, disabled=not sweep_all,
+                           help="Batch several genres (priced for every node) into one Gemini prompt during sweeps.")
+    workers = threading_level if use_threading else 1
     
     if use_threading:
         st.caption(f"🚀 Status: {threading_level} Active Threads")
     else:
         st.caption("🐢 Status: Single-Threaded Mode")
 
+    st.markdown("### `CACHE TELEMETRY`")
+    cache_stats = get_result_cache().stats()
+    st.caption(
+        f"💾 {cache_stats['entries']} entries | {cache_stats['hits']} hits | {cache_stats['stale_hits']} stale | "
+        f"{cache_stats['misses']} misses | {cache_stats['evictions']} evictions | {cache_stats['expirations']} expired"
+    )
+    st.caption(f"🔗 {get_single_flight().deduplicated} Gemini calls coalesced")
+    if GEMINI_API_KEY:
+        # Starts the background pre-warmer once per process
+        prewarmer = get_prewarmer(GEMINI_API_KEY)
+        st.caption(
+            f"🔥 Pre-warm: {prewarmer.refreshed} refreshed | {prewarmer.in_flight()} queued | "
+            f"{prewarmer.failures} failed | {PREWARM_RPM} req/min budget"
+        )
+
+    st.markdown("### `MODEL ROUTER`")
+    router = get_model_router()
+    for m_id, health in router.snapshot().items():
+        p95 = f"{health['p95']:.2f}s" if health['p95'] is not None else "n/a"
+        st.caption(
+            f"{'🟢' if health['circuit'] == 'closed' else '🔴'} {m_id}: p95 {p95} | "
+            f"{health['error_rate']:.0%} errors | {health['rate_limited']} x 429 | {health['parse_failures']} unparsed | "
+            f"{health['rows_repaired']} rows repaired, {health['rows_dropped']} dropped"
+        )
+    if ROUTER_HEDGE:
+        st.caption(f"🪁 {router.hedged} hedged | {router.hedge_wins} won by secondary")
+
+    if live_active:
+        st.markdown("### `LIVE FETCHER`")
+        live = get_live_fetcher().stats()
+        st.caption(
+            f"🌐 {live['pages']} pages | {live['pages_per_sec']:.1f} pages/s | {live['bytes'] / 1024:,.0f} KB | "
+            f"{live['not_modified']} not modified | {live['errors']} errors"
+        )
+
 if not blueprint_active:
     st.markdown("<style>.stApp { background-image: none !important; }</style>", unsafe_allow_html=True)
 
-# Expanded Genre List (20+ Categories)
-GENRES = {
-    "Science Fiction": "science-fiction", 
-    "Business": "business", 
-    "Mystery": "mystery", 
-    "Fiction": "fiction",
-    "Fantasy": "fantasy",
-    "Romance": "romance",
-    "History": "history",
-    "Thriller": "thriller",
-    "Self Help": "self-help",
-    "Biography": "biography",
-    "Technology": "technology",
-    "Philosophy": "philosophy",
-    "Psychology": "psychology",
-    "Travel": "travel",
-    "Horror": "horror",
-    "Poetry": "poetry",
-    "Science": "science",
-    "Classics": "classics",
-    "Art": "art",
-    "Cooking": "cooking",
-    "Politics": "politics",
-    "Health": "health",
-    "Comics": "comics",
-    "Sports": "sports",
-    "Religion": "religion"
-}
-
 c1, c2 = st.columns([4, 1])
 with c1:
     target = st.selectbox("TARGET E-COMMERCE SEGMENT", list(GENRES.keys()), label_visibility="collapsed")
 with c2:
     trigger = st.button("INITIALIZE ENGINE", width="stretch")
 
+# --- TITLE SEARCH ---
+# Every catalog title and cached Gemini result, across genres, without an LLM call
+query = st.text_input("SEARCH ALL TITLES", placeholder="🔎 Search every title across segments (typos welcome)...",
+                      label_visibility="collapsed")
+if query.strip():
+    index = get_title_index()
+    started = time.perf_counter()
+    with get_telemetry().span("title.search"):
+        hits = index.search(query, region_code, SEARCH_RESULTS)
+    st.caption(f"🔎 {len(hits)} matches across {len(index):,} titles in {(time.perf_counter() - started) * 1000:.2f} ms")
+    search_cols = st.columns(3)
+    for i, hit in enumerate(hits):
+        with search_cols[i % 3]:
+            genre = "Bestsellers" if hit['Genre'] == "*" else hit['Genre']
+            st.markdown(hub_card_html(dict(hit, Title=f"{hit['Title']} · {genre}",
+                                           Price=hit['Price'] if hit['Price'] is not None else "n/a",
+                                           Rating=hit['Rating'] if hit['Rating'] is not None else "–"), sym),
+                        unsafe_allow_html=True)
+
 if trigger:
     term = st.empty()
-    logs = [f"Resolving Node: {region}...", "Bypassing Proxy SSL Buffers...", f"Converting Currency to {sym}..."]
+    logs = [f"Resolving Node: {region}...", f"Converting Currency to {sym}..."]
     
     if GEMINI_API_KEY:
         logs.append("AUTHENTICATING GEMINI API...")
     else:
         logs.append("API KEY MISSING/INVALID. ENGAGING REALISTIC SIMULATION...")
 
-    txt = ""
-    for l in logs:
-        txt += f"> {datetime.now().strftime('%H:%M:%S')} {l}<br>"
-        term.markdown(f"<div class='terminal'>{txt}</div>", unsafe_allow_html=True)
-        time.sleep(0.2)
+    txt = "".join(f"> {datetime.now().strftime('%H:%M:%S')} {l}<br>" for l in logs)
+    telemetry = get_telemetry()
 
-    # --- DUAL CORE LOGIC ---
-    data = None
-    
-    # 1. Try Gemini
-    if GEMINI_API_KEY:
-        data = gemini_search_protocol(GEMINI_API_KEY, target, region_code, sym)
+    def render_terminal(trace):
+        # Live span feed: every instrumented stage lands here as it closes
+        spans = "".join(terminal_line(span) for span in trace.spans)
+        term.markdown(f"<div class='terminal'>{txt}{spans}</div>", unsafe_allow_html=True)
+
+    with Trace(sink=render_terminal) as trace:
+        # --- DUAL CORE LOGIC ---
+        data = None
+        ledger = None
+        source = "STATIC DB"
+
+        if sweep_all:
+            # 0. Sweep every segment on every node, then project the active node onto the dashboard
+            started = time.perf_counter()
+            with st.spinner(f"Sweeping {len(GENRES)} segments x {len(REGIONS)} nodes on {workers} workers..."):
+                with telemetry.span("sweep", workers=workers, batch=batch_size):
+                    ledger = pd.DataFrame(sweep_protocol(GEMINI_API_KEY, list(GENRES.keys()), list(REGIONS.values()), workers, batch_size,
+                                                          derive_active))
+            st.caption(f"🛰️ Sweep complete: {len(ledger)} assets in {time.perf_counter() - started:.2f}s")
+            data = ledger[ledger['Region'] == region_code].to_dict('records')
+
+        # 1. Try Gemini
+        first_row_at = total_latency = None
+        replayed = False
+        if GEMINI_API_KEY and not data and stream_active:
+            # Progressive rendering: KPI tiles and cards fill in as each book arrives
+            live_kpis, live_cards = st.empty(), st.empty()
+            rows, started, mark = [], time.perf_counter(), len(trace.spans)
+            try:
+                for row in gemini_stream_protocol(GEMINI_API_KEY, target, region_code, sym, derive_active):
+                    if not rows:
+                        first_row_at = time.perf_counter() - started
+                    rows.append(row)
+                    live_kpis.markdown(f"""
+                        <div class="singularity-matrix">
+                            <div class="matrix-node">
+                                <div class="node-label">Avg Market Price (Streaming)</div>
+                                <div class="node-value">{sym}{sum(r['Price'] for r in rows) / len(rows):,.2f}</div>
+                            </div>
+                            <div class="matrix-node">
+                                <div class="node-label">Assets Received</div>
+                                <div class="node-value">{len(rows)} Units</div>
+                            </div>
+                            <div class="matrix-node">
+                                <div class="node-label">Time to First Row</div>
+                                <div class="node-value">{first_row_at:.2f}s</div>
+                            </div>
+                        </div>
+                    """, unsafe_allow_html=True)
+                    live_cards.markdown(f'<div class="singularity-matrix">{"".join(hub_card_html(r, sym) for r in rows)}</div>', unsafe_allow_html=True)
+            except Exception as e:
+                st.error(f"Neural Engine Final Error: {e}")
+            total_latency = time.perf_counter() - started
+            # Rows replayed from the cache or another session's stream never touched the model
+            replayed = bool(rows) and not any(span["span"] == "gemini.stream" for span in trace.spans[mark:])
+            if replayed:
+                first_row_at = None
+            live_kpis.empty()
+            live_cards.empty()
+            data = rows
+            if rows:
+                source = "GEMINI LIVE"
+
+        elif GEMINI_API_KEY and not data:
+            with st.spinner("Neural Engine is analyzing market data..."):
+                try:
+                    data = gemini_search_protocol(GEMINI_API_KEY, target, region_code, sym, derive_active)
+                    if data:
+                        source = "GEMINI LIVE"
+                except Exception as e:
+                    st.error(f"Neural Engine Final Error: {e}")
     
-    # 2. Fallback to Realistic Simulation (Not Fake Scraper)
-    if not data:
-        if GEMINI_API_KEY:
-             term.markdown(f"<div class='terminal'>{txt}> ERROR: API Connection Failed. Switching to Static Database...</div>", unsafe_allow_html=True)
-        data = simulation_protocol(target, region_code)
+        # 2. Fallback to Realistic Simulation (Not Fake Scraper)
+        if not data:
+            if GEMINI_API_KEY:
+                txt += "> ERROR: API Connection Failed. Switching to Static Database...<br>"
+            with telemetry.span("static.fallback"):
+                data = simulation_protocol(target, region_code)
     
-    if data:
-        df = pd.DataFrame(data)
-        term.empty()
+        if data:
+            with telemetry.span("dataframe.build", rows=len(data)):
+                df = pd.DataFrame(data)
+            if ledger is None:
+                ledger = df
+            if 'Source' in df:
+                # Sweeps tag every row; a node served partly from each source shows MIXED
+                sources = df['Source'].unique()
+                source = sources[0] if len(sources) == 1 else "MIXED"
+
+            reco = df[df['Rating'] == df['Rating'].max()].iloc[0]
 
-        reco = df[df['Rating'] == df['Rating'].max()].iloc[0]
+            history = get_price_history()
+            history_note = ""
+            if history is not None:
+                # Rolling aggregates are kept current on every append; only this run's queued write is awaited
+                history.flush()
+                seen = history.aggregates(region_code, None if sweep_all else target)
+                observations = sum(a['Observations'] for a in seen)
+                if observations:
+                    avg = sum(a['Mean'] * a['Observations'] for a in seen) / observations
+                    history_note = f"History avg {sym}{avg:,.2f} over {observations:,} observations.<br>"
         
-        st.markdown(f"""
-            <div class="singularity-matrix">
-                <div class="matrix-node">
-                    <div class="node-label">Avg Market Price</div>
-                    <div class="node-value">{sym}{df['Price'].mean():,.2f}</div>
-                    <div class="status-badge" style="background:rgba(59,130,246,0.2); color:#3b82f6;">{region} Node</div>
-                    <p style="font-size: 0.7rem; color: #64748b; margin-top: 5px; line-height: 1.2;">
-                        *Prices vary by trend volatility.<br>Estimates may differ from live listings.
-                    </p>
-                </div>
-                <div class="matrix-node" style="border-left-color: #f59e0b;">
-                    <div class="node-label">Oracle's Pick</div>
-                    <div class="node-value" style="font-size:1rem; margin-top:12px;">{reco['Title']}</div>
-                    <a href="{reco['Link1']}" style="color:#06b6d4; font-size:0.75rem; font-weight:800; text-decoration:underline;" target="_blank">Direct Buy on {reco['Label1']}</a>
-                </div>
-                <div class="matrix-node">
-                    <div class="node-label">Total Assets Found</div>
-                    <div class="node-value">{len(df)} Units</div>
-                    <div class="status-badge" style="background:rgba(255,255,255,0.1); color:#fff;">Source: {"GEMINI LIVE" if GEMINI_API_KEY and data != df.to_dict('records') else "STATIC DB"}</div>
+            st.markdown(f"""
+                <div class="singularity-matrix">
+                    <div class="matrix-node">
+                        <div class="node-label">Avg Market Price</div>
+                        <div class="node-value">{sym}{df['Price'].mean():,.2f}</div>
+                        <div class="status-badge" style="background:rgba(59,130,246,0.2); color:#3b82f6;">{region} Node</div>
+                        <p style="font-size: 0.7rem; color: #64748b; margin-top: 5px; line-height: 1.2;">
+                            {history_note}*Prices vary by trend volatility.<br>Estimates may differ from live listings.
+                        </p>
+                    </div>
+                    <div class="matrix-node" style="border-left-color: #f59e0b;">
+                        <div class="node-label">Oracle's Pick</div>
+                        <div class="node-value" style="font-size:1rem; margin-top:12px;">{reco['Title']}</div>
+                        <a href="{reco['Link1']}" style="color:#06b6d4; font-size:0.75rem; font-weight:800; text-decoration:underline;" target="_blank">Direct Buy on {reco['Label1']}</a>
+                    </div>
+                    <div class="matrix-node">
+                        <div class="node-label">Total Assets Found</div>
+                        <div class="node-value">{len(df)} Units</div>
+                        <div class="status-badge" style="background:rgba(255,255,255,0.1); color:#fff;">Source: {source}</div>
+                    </div>
                 </div>
-            </div>
-        """, unsafe_allow_html=True)
-
-        tab_list = ["📊 Market Intelligence", "⚡ Marketplace Hub"]
-        if neural_active: tab_list.insert(1, "🧠 Neural Analysis")
-        tabs = st.tabs(tab_list)
-
-        with tabs[0]:
-            st.markdown(f"#### 🌀 {viz_mode} Intelligence ({sym})")
-            if viz_mode == "Predictive Trend":
-                dates, prices = get_prediction(df.iloc[0]['Price'])
-                f_df = pd.DataFrame({"Date": dates, "Projected Price": prices})
-                fig = px.line(f_df, x="Date", y="Projected Price", template="plotly_dark", markers=True)
-                fig.update_traces(line_color='#06b6d4', line_width=4)
-            elif viz_mode == "3D Value Matrix":
-                fig = px.scatter(df, x="Price", y="Rating", size="Price", color="Price", template="plotly_dark", hover_name="Title")
-            elif viz_mode == "Crawl Yield Radial":
-                fig = px.pie(df, names='Rating', hole=0.6, template='plotly_dark')
-            else:
-                fig = px.density_heatmap(df, x="Price", y="Rating", template="plotly_dark", color_continuous_scale="Viridis")
-            fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', transition_duration=1500)
-            st.plotly_chart(fig, width="stretch")
-
-        if neural_active:
-            with tabs[1]:
-                st.success(f"Neural Pattern Recognition identified these 'Hidden Gems' in the {region} Market.")
+            """, unsafe_allow_html=True)
+
+            if 'FetchedAt' in df and df['FetchedAt'].notna().any():
+                # Age indicator: stale rows are being revalidated in the background
+                age = (datetime.now() - pd.to_datetime(df['FetchedAt']).min()).total_seconds()
+                refresh_note = " (stale, refreshing in background)" if age > CACHE_TTL else ""
+                st.caption(f"🕒 Market data age: {age / 60:.0f} min{refresh_note}")
+
+            if first_row_at is not None:
+                st.caption(f"⏱️ Time to first row: {first_row_at:.2f}s | Total latency: {total_latency:.2f}s")
+            elif replayed:
+                st.caption(f"⏱️ Replayed without a model call | Total latency: {total_latency:.2f}s")
+
+            tab_list = ["📊 Market Intelligence", "⚡ Marketplace Hub"]
+            if neural_active: tab_list.insert(1, "🧠 Neural Analysis")
+            tabs = st.tabs(tab_list)
+
+            with tabs[0]:
+                st.markdown(f"#### 🌀 {viz_mode} Intelligence ({sym})")
+                with telemetry.span("chart.build", mode=viz_mode):
+                    if viz_mode == "Predictive Trend":
+                        # Monte Carlo bands for every title; the lead title gets its p5-p95 envelope shaded
+                        f_df = forecast_protocol(df['Title'], df['Price'], region_code)
+                        shown = list(dict.fromkeys(df['Title']))[:FORECAST_LINES]
+                        fig = px.line(f_df[f_df['Title'].isin(shown)], x="Date", y="P50", color="Title", template="plotly_dark",
+                                      markers=True, labels={"P50": "Projected Price (p50)"})
+                        lead = f_df[f_df['Title'] == shown[0]]
+                        fig.add_scatter(x=lead['Date'], y=lead['P95'], mode="lines", line_width=0, showlegend=False, hoverinfo="skip")
+                        fig.add_scatter(x=lead['Date'], y=lead['P5'], mode="lines", line_width=0, fill="tonexty",
+                                        fillcolor="rgba(6,182,212,0.2)", name=f"{shown[0]} (p5-p95)")
+                        if len(shown) < df['Title'].nunique():
+                            st.caption(f"Showing {len(shown)} of {df['Title'].nunique()} forecast titles.")
+                    elif viz_mode == "Price History":
+                        # Stored observations of this segment's titles, read from its own partitions only
+                        segment_titles = df[df['Genre'] == target]['Title'] if 'Genre' in df else df['Title']
+                        shown = list(dict.fromkeys(segment_titles))[:FORECAST_LINES]
+                        h_df = (history.series(region_code, target, shown, since=datetime.now() - timedelta(days=HISTORY_DAYS))
+                                if history is not None else pd.DataFrame(columns=["Title", "ObservedAt", "Price", "Source"]))
+                        h_plot, render_mode = chart_frame(h_df)
+                        fig = px.line(h_plot.sort_values("ObservedAt"), x="ObservedAt", y="Price", color="Title", template="plotly_dark",
+                                      markers=render_mode != "webgl", render_mode=render_mode, hover_data=["Source"],
+                                      labels={"ObservedAt": "Observed", "Price": f"Price ({sym})"})
+                        st.caption(f"{len(h_df):,} stored observations of {target} over the last {HISTORY_DAYS} days.")
+                    elif viz_mode == "3D Value Matrix":
+                        plot_df, render_mode = chart_frame(df)
+                        fig = px.scatter(plot_df, x="Price", y="Rating", size="Price", color="Price", template="plotly_dark",
+                                         hover_name="Title", render_mode=render_mode)
+                    elif viz_mode == "Crawl Yield Radial":
+                        # Aggregated before plotting: one slice per rating, whatever the row count
+                        yield_df = df['Rating'].value_counts().rename_axis('Rating').reset_index(name='Units')
+                        fig = px.pie(yield_df, names='Rating', values='Units', hole=0.6, template='plotly_dark')
+                    else:
+                        plot_df, render_mode = chart_frame(df)
+                        fig = px.density_heatmap(plot_df, x="Price", y="Rating", template="plotly_dark", color_continuous_scale="Viridis")
+                    if viz_mode in ("3D Value Matrix", "Satisfaction Density") and len(plot_df) < len(df):
+                        st.caption(f"Plotting a {len(plot_df):,}-row sample of {len(df):,} assets.")
+                    fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', transition_duration=1500)
+                st.plotly_chart(fig, width="stretch")
+
+            if neural_active:
+                with tabs[1]:
+                    st.success(f"Neural Pattern Recognition identified these 'Hidden Gems' in the {region} Market.")
                 
-                # --- ADDED ACCURACY DISCLAIMER FOR NEURAL ANALYSIS ---
+                    # --- ADDED ACCURACY DISCLAIMER FOR NEURAL ANALYSIS ---
+                    st.markdown("""
+                        <div style="background:rgba(234, 179, 8, 0.1); border-left: 3px solid #eab308; padding: 10px; margin-bottom: 20px; border-radius: 4px;">
+                            <p style="color:#cbd5e1; font-size:0.8rem; margin:0;">
+                                ⚠️ <b>Accuracy Warning:</b> Prices used for value analysis are algorithmic estimates. 
+                                Real-time market volatility may affect the calculated value score.
+                            </p>
+                        </div>
+                    """, unsafe_allow_html=True)
+
+                    with telemetry.span("cards.render", tab="gems"):
+                        df['ValueScore'] = (df['Rating'] * 10) / (df['Price'])
+                        # Top three without sorting the whole result set
+                        st.markdown(gem_cards_html(df.nlargest(3, 'ValueScore'), sym), unsafe_allow_html=True)
+
+            with tabs[-1]:
+                st.markdown(f"#### ⚡ Marketplace Hub ({region} Portal)")
+            
+                # --- ADDED ACCURACY DISCLAIMER ---
                 st.markdown("""
                     <div style="background:rgba(234, 179, 8, 0.1); border-left: 3px solid #eab308; padding: 10px; margin-bottom: 20px; border-radius: 4px;">
                         <p style="color:#cbd5e1; font-size:0.8rem; margin:0;">
-                            ⚠️ <b>Accuracy Warning:</b> Prices used for value analysis are algorithmic estimates. 
-                            Real-time market volatility may affect the calculated value score.
+                            ⚠️ <b>Accuracy Warning:</b> Prices shown are algorithmic estimates based on historical trend data. 
+                            Actual list prices on Amazon/Flipkart may vary due to real-time seller volatility.
                         </p>
                     </div>
                 """, unsafe_allow_html=True)
 
-                df['ValueScore'] = (df['Rating'] * 10) / (df['Price'])
-                gems = df.sort_values(by='ValueScore', ascending=False).head(3)
-                for _, gem in gems.iterrows():
-                    st.markdown(f"""
-                        <div style="background:rgba(6,182,212,0.1); padding:20px; border-radius:15px; border-left:5px solid #06b6d4; margin-bottom:10px;">
-                            <h5 style="margin:0;">{gem['Title']}</h5>
-                            <p style="color:#94a3b8; font-size:0.8rem; margin:5px 0;">Rating: {gem['Rating']}★ | Price: {sym}{gem['Price']}</p>
-                            <a href="{gem['Link1']}" target="_blank" style="color:#06b6d4; font-size:0.75rem; font-weight:800;">{gem['Label1']} SOURCE</a>
-                        </div>
-                    """, unsafe_allow_html=True)
-
-        with tabs[-1]:
-            st.markdown(f"#### ⚡ Marketplace Hub ({region} Portal)")
+                marketplace_hub(df, sym, live_active)
             
-            # --- ADDED ACCURACY DISCLAIMER ---
-            st.markdown("""
-                <div style="background:rgba(234, 179, 8, 0.1); border-left: 3px solid #eab308; padding: 10px; margin-bottom: 20px; border-radius: 4px;">
-                    <p style="color:#cbd5e1; font-size:0.8rem; margin:0;">
-                        ⚠️ <b>Accuracy Warning:</b> Prices shown are algorithmic estimates based on historical trend data. 
-                        Actual list prices on Amazon/Flipkart may vary due to real-time seller volatility.
-                    </p>
-                </div>
-            """, unsafe_allow_html=True)
+                st.divider()
+                st.download_button("💾 DOWNLOAD MASTER SYSTEM LEDGER (CSV)", ledger.to_csv(index=False).encode('utf-8'), f"omniscraper.csv", width="stretch")
 
-            hub_cols = st.columns(3)
-            for i, (_, row) in enumerate(df.head(9).iterrows()):
-                with hub_cols[i % 3]:
-                    st.markdown(f"""
-                        <div style="background:rgba(59,130,246,0.08); padding:20px; border-radius:24px; border:1px solid rgba(59,130,246,0.15); margin-bottom:15px;">
-                            <h6 style="margin:0; height:45px; overflow:hidden;">{row['Title']}</h6>
-                            <p style="color:#94a3b8; font-size:0.8rem; margin:10px 0;"><b>{sym}{row['Price']}</b> | {row['Rating']}★</p>
-                            <div class="hub-grid">
-                                <a href="{row['Link1']}" class="hub-btn btn-pri" target="_blank">{row['Label1']}</a>
-                                <a href="{row['Link2']}" class="hub-btn btn-sec" target="_blank">{row['Label2']}</a>
-                            </div>
-                        </div>
-                    """, unsafe_allow_html=True)
-            
-            st.divider()
-            st.download_button("💾 DOWNLOAD MASTER SYSTEM LEDGER (CSV)", df.to_csv(index=False).encode('utf-8'), f"omniscraper.csv", width="stretch")
\ No newline at end of file
+    # --- TELEMETRY EXPORT ---
+    render_terminal(trace)
+    metrics = telemetry.prometheus()
+    if METRICS_PATH:
+        # Prometheus textfile-collector format, rewritten after every run
+        with open(METRICS_PATH, "w", encoding="utf-8") as f:
+            f.write(metrics)
+    with st.expander("📡 Telemetry Export"):
+        e1, e2 = st.columns(2)
+        e1.download_button("Run Spans (JSONL)", trace.to_jsonl().encode('utf-8'), "omniscraper_spans.jsonl", width="stretch")
+        e2.download_button("Metrics (Prometheus)", metrics.encode('utf-8'), "omniscraper_metrics.prom", width="stretch")
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+ENGINE BENCHMARK:
+Per-call latency of the engine and render hot paths, with Gemini replaced
+by MockGenai so the cached, uncached and rate-limited lookups are measured
+without a network or an API key.
+
+    python benchmarks/engine_bench.py --json engine_bench.json
+    python benchmarks/engine_bench.py --baseline engine_bench.json   # exit 1 on a >20% p50 regression
+"""
+import argparse
+import itertools
+import sys
+import time
+
+import harness
+
+
+def measure(fn, repeat, number):
+    """Milliseconds per call: `repeat` samples, each the mean of `number` calls."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) * 1000 / number)
+    result = harness.summarize(samples)
+    result["calls_per_sec"] = 1000 / result["p50"] if result["p50"] else None
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the OmniScraper engine and render hot paths")
+    parser.add_argument("--repeat", type=int, default=20, help="samples per case (default 20)")
+    parser.add_argument("--rows", type=int, default=5000, help="rows in the DataFrame and card cases (default 5000)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock Gemini latency in seconds (default 0.05)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare p50s against a saved run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 growth against the baseline (default 0.2)")
+    args = parser.parse_args(argv)
+
+    harness.isolate()
+    mock = harness.MockGenai(latency=args.latency, jitter=args.latency / 5).install()
+
+    import pandas as pd
+
+    import engine
+    import render
+
+    genres = list(engine.GENRES)
+    regions = list(engine.REGION_CODES.values())
+    segments = itertools.cycle([(genre, code) for genre in genres for _, code in regions])
+    rows = [row for genre in genres for _, code in regions for row in engine.simulation_protocol(genre, code)]
+    rows = (rows * (args.rows // len(rows) + 1))[:args.rows]
+    df = pd.DataFrame(rows)
+    df['ValueScore'] = (df['Rating'] * 10) / (df['Price'])
+    key = engine.GEMINI_API_KEY
+    # Each miss asks for a segment nobody has asked for before
+    fresh = (f"Benchmark Genre {i}" for i in itertools.count())
+
+    cases = {}
+
+    def case(name, fn, number=1, repeat=args.repeat):
+        cases[name] = measure(fn, repeat, number)
+        r = cases[name]
+        print(f"{name:<34}{r['p50']:>10.3f}{r['p95']:>10.3f}{r['p99']:>10.3f}", flush=True)
+
+    print(f"{'case (ms per call)':<34}{'p50':>10}{'p95':>10}{'p99':>10}")
+    case("simulation_protocol", lambda: engine.simulation_protocol(*next(segments)), number=50)
+    case("get_market_links", lambda: engine.get_market_links("The Midnight Library", "IN"), number=2000)
+    case("get_prediction", lambda: engine.get_prediction(499.0), number=20)
+    case(f"dataframe_build[{len(rows)}]", lambda: pd.DataFrame(rows), number=5)
+    case(f"value_score_top3[{len(df)}]",
+         lambda: ((df['Rating'] * 10) / df['Price']).nlargest(3), number=20)
+    case("hub_cards_page", lambda: render.hub_cards_html(render.page(df, 1), "₹"), number=200)
+    case(f"hub_cards_all[{len(df)}]", lambda: render.hub_cards_html(df, "₹"), number=2)
+    case("gem_cards", lambda: render.gem_cards_html(df.nlargest(3, 'ValueScore'), "₹"), number=50)
+
+    # Gemini lookups, in order of severity: the router's circuits carry from one case into the next
+    case("gemini_search.miss", lambda: engine.gemini_search_protocol(key, next(fresh), "IN", "₹"))
+    engine.gemini_search_protocol(key, "Fiction", "IN", "₹")
+    case("gemini_search.hit", lambda: engine.gemini_search_protocol(key, "Fiction", "IN", "₹"), number=200)
+    mock.rate_limit, mock.limited_models = 1.0, {engine.GEMINI_MODELS[0]}
+    case("gemini_search.primary_429", lambda: engine.gemini_search_protocol(key, next(fresh), "IN", "₹"))
+    mock.limited_models = None
+    case("gemini_search.all_429", lambda: engine.gemini_search_protocol(key, next(fresh), "IN", "₹"),
+         repeat=max(1, args.repeat // 10))
+
+    result = {"env": harness.environment(), "args": vars(args), "cases": cases,
+              "mock": mock.stats(), "router": engine.get_model_router().snapshot(),
+              "cache": engine.get_result_cache().stats()}
+    if args.json:
+        harness.write_json(args.json, result)
+    if args.baseline:
+        slower = harness.regressions(cases, args.baseline, "p50", args.threshold)
+        for name, before, after in slower:
+            print(f"REGRESSION {name}: p50 {before:.3f} -> {after:.3f} ms", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
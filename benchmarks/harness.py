@@ -0,0 +1,183 @@
+"""
+BENCHMARK HARNESS:
+Shared by the benchmark scripts: an isolated engine environment (throwaway
+cache and history, no pre-warm), a mocked google.genai client with
+configurable latency and 429 injection, and latency summaries that can be
+saved as JSON and compared against an earlier run.
+"""
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def isolate(api_key="benchmark-key", history=False):
+    """
+    Points the engine at a throwaway cache (and history, if asked) and turns
+    off pre-warming. Must run before `engine` is first imported, since the
+    engine reads its configuration at import time. Returns the scratch dir.
+    """
+    if "engine" in sys.modules:
+        raise RuntimeError("isolate() must run before engine is imported")
+    scratch = tempfile.mkdtemp(prefix="omni_bench_")
+    os.environ["GEMINI_API_KEY"] = api_key or ""
+    os.environ["OMNI_CACHE_PATH"] = os.path.join(scratch, "cache.sqlite3")
+    os.environ["OMNI_HISTORY_PATH"] = os.path.join(scratch, "history") if history else ""
+    os.environ["OMNI_PREWARM"] = "0"
+    os.environ.pop("OMNI_TRACE_PATH", None)
+    os.environ.pop("OMNI_METRICS_PATH", None)
+    return scratch
+
+
+# --- MOCK GEMINI ---
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Models:
+    def __init__(self, mock):
+        self._mock = mock
+
+    def generate_content(self, model, contents, config=None, **kw):
+        return _Response(self._mock.respond(model, contents))
+
+    def generate_content_stream(self, model, contents, config=None, **kw):
+        text = self._mock.respond(model, contents)
+        for i in range(0, len(text), self._mock.chunk):
+            yield _Response(text[i:i + self._mock.chunk])
+
+
+class _Client:
+    def __init__(self, mock):
+        self.models = _Models(mock)
+
+
+class MockGenai:
+    """
+    Stand-in for google.genai.Client. Every call sleeps `latency` seconds
+    (+/- `jitter`), then fails with a real 429 ClientError with probability
+    `rate_limit` - only on `limited_models` when given - or answers with
+    schema-valid rows for whatever segment or batch the prompt asks for.
+
+        mock = MockGenai(latency=0.2, rate_limit=1.0, limited_models={"gemini-2.5-flash"}).install()
+    """
+
+    def __init__(self, latency=0.2, jitter=0.05, rate_limit=0.0, limited_models=None, chunk=64, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.limited_models = set(limited_models) if limited_models else None
+        self.chunk = chunk
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._original = None
+
+    def install(self):
+        from google import genai
+
+        self._original = genai.Client
+        genai.Client = lambda api_key=None, **kw: _Client(self)
+        return self
+
+    def uninstall(self):
+        if self._original is not None:
+            from google import genai
+
+            genai.Client, self._original = self._original, None
+
+    def respond(self, model, prompt):
+        with self._lock:
+            self.calls[model] += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            limited = (self.limited_models is None or model in self.limited_models) and self._rng.random() < self.rate_limit
+            if limited:
+                self.rate_limited[model] += 1
+        time.sleep(delay)
+        if limited:
+            from google.genai import errors
+
+            raise errors.ClientError(429, {"error": {"code": 429, "message": "Resource has been exhausted (mock).",
+                                                     "status": "RESOURCE_EXHAUSTED"}})
+        return json.dumps(self._payload(prompt))
+
+    def _payload(self, prompt):
+        if "keyed by" in prompt:
+            genres = json.loads(re.search(r"genres: (\[.*?\])", prompt).group(1))
+            codes = re.findall(r'"(\w+)": 14\.99', prompt)
+            return {genre: [{"Title": f"{genre} Bestseller {i}", "Rating": 3 + i % 3,
+                             "Price": {code: self._price(code) for code in codes}} for i in range(6)]
+                    for genre in genres}
+        genre = re.search(r"trending '(.+?)' books", prompt).group(1)
+        code = re.search(r"for the (\w+) market", prompt).group(1)
+        return [{"Title": f"{genre} Bestseller {i}", "Price": self._price(code), "Rating": 3 + i % 3} for i in range(6)]
+
+    def _price(self, code):
+        with self._lock:
+            usd = round(self._rng.uniform(8, 30), 2)
+        return round(usd * 84) if code == "IN" else round(usd * 0.78, 2) if code == "UK" else usd
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "rate_limited": dict(self.rate_limited)}
+
+
+# --- RESULTS ---
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {"n": len(ordered), "mean": sum(ordered) / len(ordered), "min": ordered[0],
+            "p50": percentile(ordered, 0.50), "p95": percentile(ordered, 0.95),
+            "p99": percentile(ordered, 0.99), "max": ordered[-1]}
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def environment():
+    return {"ts": time.time(), "python": sys.version.split()[0], "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+
+
+def write_json(path, payload):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, default=str)
+
+
+def regressions(current, baseline_path, metric, threshold):
+    """
+    Cases whose `metric` grew by more than `threshold` (0.2 = 20%) against
+    the same case in a saved run: a list of (case, before, after).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["cases"]
+    slower = []
+    for name, result in current.items():
+        before = baseline.get(name, {}).get(metric)
+        after = result.get(metric)
+        if before and after is not None and after > before * (1 + threshold):
+            slower.append((name, before, after))
+    return slower
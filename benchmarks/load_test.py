@@ -0,0 +1,165 @@
+"""
+LOAD TEST:
+N concurrent users pressing INITIALIZE ENGINE against one shared engine,
+the way sessions of a single Streamlit server share its process. Each
+press replays what app.py does on the click - the Gemini stream or lookup,
+static fallback, DataFrame, forecast chart, gems and a Marketplace Hub
+page - with Gemini replaced by MockGenai, so latency and 429 rate are
+dialled in from the command line. Streamlit's AppTest keeps one Runtime
+per process and cannot run sessions concurrently, so presses are driven
+headless; widget rendering is covered by render_bench.py.
+
+Reports per-press latency percentiles, throughput, peak memory, per-span
+latencies from the engine's own telemetry and its cache / coalescing /
+router counters.
+
+    python benchmarks/load_test.py --users 16 --presses 5 --latency 0.3 --rate-limit 0.1 --json load.json
+    python benchmarks/load_test.py --users 16 --baseline load.json   # exit 1 on a >20% p95 regression
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+import harness
+
+
+def press(engine, render, pd, px, genre, region, stream):
+    """One INITIALIZE ENGINE click, headless. Returns the spans it recorded."""
+    sym, region_code = engine.REGIONS[region]
+    key = engine.GEMINI_API_KEY
+    telemetry = engine.get_telemetry()
+    with engine.Trace() as trace:
+        data = None
+        if key and stream:
+            data = list(engine.gemini_stream_protocol(key, genre, region_code, sym))
+        elif key:
+            data = engine.gemini_search_protocol(key, genre, region_code, sym)
+        if not data:
+            with telemetry.span("static.fallback"):
+                data = engine.simulation_protocol(genre, region_code)
+
+        with telemetry.span("dataframe.build", rows=len(data)):
+            df = pd.DataFrame(data)
+        with telemetry.span("chart.build", mode="Predictive Trend"):
+            f_df = engine.forecast_protocol(df['Title'], df['Price'], region_code)
+            px.line(f_df, x="Date", y="P50", color="Title", template="plotly_dark", markers=True).to_json()
+        with telemetry.span("cards.render", tab="gems"):
+            df['ValueScore'] = (df['Rating'] * 10) / (df['Price'])
+            render.gem_cards_html(df.nlargest(3, 'ValueScore'), sym)
+        with telemetry.span("cards.render", tab="hub"):
+            render.hub_cards_html(render.page(df, 1), sym)
+        df.to_csv(index=False)
+    return trace.spans
+
+
+def user(number, args, segments, modules, latencies, spans, failures, barrier):
+    rng = random.Random(args.seed + number)
+    barrier.wait()
+    for _ in range(args.presses):
+        genre, region = rng.choice(segments)
+        started = time.perf_counter()
+        try:
+            recorded = press(*modules, genre, region, not args.no_stream)
+        except Exception as e:
+            failures.append(f"user {number} on {genre} / {region}: {e!r}")
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+        spans.extend(recorded)
+        time.sleep(rng.uniform(0, args.think))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive concurrent OmniScraper sessions against a mocked Gemini")
+    parser.add_argument("--users", type=int, default=16, help="concurrent sessions (default 16)")
+    parser.add_argument("--presses", type=int, default=5, help="INITIALIZE ENGINE presses per session (default 5)")
+    parser.add_argument("--segments", type=int, default=12,
+                        help="distinct genre x node segments the users draw from; fewer means more cache hits (default 12)")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock Gemini latency in seconds (default 0.3)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="mock latency jitter in seconds (default 0.1)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability a mock call answers 429 (default 0)")
+    parser.add_argument("--think", type=float, default=0.0, help="max seconds a user pauses between presses (default 0)")
+    parser.add_argument("--no-stream", action="store_true", help="press with Streaming Responses off (gemini_search_protocol)")
+    parser.add_argument("--tracemalloc", action="store_true", help="also trace the Python heap peak (slows the run)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare p95 latencies against a saved run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 growth against the baseline (default 0.2)")
+    args = parser.parse_args(argv)
+
+    harness.isolate()
+    mock = harness.MockGenai(latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit, seed=args.seed).install()
+
+    import pandas as pd
+    import plotly.express as px
+
+    import engine
+    import render
+
+    pool = [(genre, region) for genre in engine.GENRES for region in engine.REGIONS]
+    segments = random.Random(args.seed).sample(pool, min(args.segments, len(pool)))
+    # Build the process-wide singletons up front, as a long-running server already has
+    engine.get_static_catalog(), engine.get_forecaster(), engine.get_result_cache()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    latencies, spans, failures = [], [], []
+    barrier = threading.Barrier(args.users + 1)
+    threads = [threading.Thread(target=user, name=f"user-{i}",
+                                args=(i, args, segments, (engine, render, pd, px), latencies, spans, failures, barrier))
+               for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    heap_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+
+    by_span = defaultdict(list)
+    for span in spans:
+        by_span[f"{span['span']}.{span['tab']}" if "tab" in span else span["span"]].append(span["ms"])
+    cases = {"press": harness.summarize(latencies)} if latencies else {}
+    cases.update((f"span:{name}", harness.summarize(ms)) for name, ms in sorted(by_span.items()))
+
+    cache = engine.get_result_cache().stats()
+    result = {
+        "env": harness.environment(), "args": vars(args), "cases": cases,
+        "presses": len(latencies), "failures": failures, "wall_s": wall,
+        "throughput_per_s": len(latencies) / wall if wall else None,
+        "peak_rss_bytes": harness.peak_rss_bytes(), "peak_heap_bytes": heap_peak,
+        "mock": mock.stats(), "cache": cache, "coalesced": engine.get_single_flight().deduplicated,
+        "router": engine.get_model_router().snapshot(),
+    }
+
+    print(f"{args.users} users x {args.presses} presses over {len(segments)} segments in {wall:.2f}s: "
+          f"{result['throughput_per_s']:.2f} presses/s")
+    print(f"{'ms':<28}{'p50':>10}{'p95':>10}{'p99':>10}{'n':>8}")
+    for name, r in cases.items():
+        print(f"{name:<28}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}{r['n']:>8}")
+    rss = result["peak_rss_bytes"]
+    print(f"peak RSS {rss / 2**20:,.0f} MB" if rss else "peak RSS n/a",
+          f"| peak heap {heap_peak / 2**20:,.1f} MB" if heap_peak else "")
+    print(f"gemini calls {sum(mock.calls.values())} ({sum(mock.rate_limited.values())} x 429) | "
+          f"cache {cache['hits']} hits, {cache['misses']} misses | {result['coalesced']} coalesced")
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+
+    if args.json:
+        harness.write_json(args.json, result)
+    if args.baseline:
+        slower = harness.regressions(cases, args.baseline, "p95", args.threshold)
+        for name, before, after in slower:
+            print(f"REGRESSION {name}: p95 {before:.1f} -> {after:.1f} ms", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
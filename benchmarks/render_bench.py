@@ -0,0 +1,124 @@
+"""
+RENDER BENCHMARK:
+Times the dashboard's render layer on a 5,000-row multi-genre result, old
+per-row paths against the ones app.py uses now. Headless: only render,
+engine, pandas and plotly are imported, and the engine writes to a
+throwaway cache and history.
+
+    python benchmarks/render_bench.py --rows 5000 --json render_bench.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+import harness
+
+harness.isolate(api_key=None)
+
+import pandas as pd
+import plotly.express as px
+
+import engine
+import render
+
+
+def result_frame(rows):
+    """A static all-genre sweep across every region, tiled up to `rows` rows."""
+    base = engine.sweep_protocol(None, list(engine.GENRES), list(engine.REGION_CODES.values()), 1)
+    tiled = [dict(row, Title=f"{row['Title']} #{i // len(base)}") for i, row in
+             zip(range(rows), (base[i % len(base)] for i in range(rows)))]
+    return pd.DataFrame(tiled)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), out
+
+
+# --- THE PATHS app.py USED BEFORE ---
+def legacy_cards(df, sym):
+    html = []
+    for _, row in df.iterrows():
+        html.append(f"""
+        <div style="background:rgba(59,130,246,0.08); padding:20px; border-radius:24px; border:1px solid rgba(59,130,246,0.15); margin-bottom:15px;">
+            <h6 style="margin:0; height:45px; overflow:hidden;">{row['Title']}</h6>
+            <p style="color:#94a3b8; font-size:0.8rem; margin:10px 0;"><b>{sym}{row['Price']}</b> | {row['Rating']}★</p>
+            <div class="hub-grid">
+                <a href="{row['Link1']}" class="hub-btn btn-pri" target="_blank">{row['Label1']}</a>
+                <a href="{row['Link2']}" class="hub-btn btn-sec" target="_blank">{row['Label2']}</a>
+            </div>
+        </div>
+    """)
+    return "".join(html)
+
+
+def legacy_gems(df, sym):
+    html = []
+    for _, gem in df.sort_values(by='ValueScore', ascending=False).head(3).iterrows():
+        html.append(f"""
+        <div style="background:rgba(6,182,212,0.1); padding:20px; border-radius:15px; border-left:5px solid #06b6d4; margin-bottom:10px;">
+            <h5 style="margin:0;">{gem['Title']}</h5>
+            <p style="color:#94a3b8; font-size:0.8rem; margin:5px 0;">Rating: {gem['Rating']}★ | Price: {sym}{gem['Price']}</p>
+            <a href="{gem['Link1']}" target="_blank" style="color:#06b6d4; font-size:0.75rem; font-weight:800;">{gem['Label1']} SOURCE</a>
+        </div>
+    """)
+    return "".join(html)
+
+
+def legacy_source(df):
+    return df.to_dict('records')[0].get('Source', 'GEMINI LIVE')
+
+
+def scatter(df, mode="auto"):
+    return px.scatter(df, x="Price", y="Rating", size="Price", color="Price", template="plotly_dark",
+                      hover_name="Title", render_mode=mode)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the OmniScraper render layer")
+    parser.add_argument("--rows", type=int, default=5000, help="rows in the result set (default 5000)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement; the median is reported (default 5)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    df = result_frame(args.rows)
+    sym = "₹"
+    df['ValueScore'] = (df['Rating'] * 10) / (df['Price'])
+    results = []
+
+    def case(name, old, new):
+        old_ms, _ = timed(old, args.repeat)
+        new_ms, _ = timed(new, args.repeat)
+        results.append({"case": name, "old_ms": round(old_ms, 3), "new_ms": round(new_ms, 3),
+                        "speedup": round(old_ms / new_ms, 1) if new_ms else None})
+
+    case("hub cards, every row", lambda: legacy_cards(df, sym), lambda: render.hub_cards_html(df, sym))
+    # The old hub only ever rendered df.head(9)
+    case("hub cards, shown page", lambda: legacy_cards(df.head(9), sym), lambda: render.hub_cards_html(render.page(df, 1), sym))
+    case("top 3 gems", lambda: legacy_gems(df, sym),
+         lambda: render.gem_cards_html(df.nlargest(3, 'ValueScore'), sym))
+    case("source badge", lambda: legacy_source(df), lambda: df['Source'].unique())
+    case("scatter figure", lambda: scatter(df).to_json(), lambda: scatter(*render.chart_frame(df)).to_json())
+
+    old_payload = len(scatter(df).to_json())
+    new_payload = len(scatter(*render.chart_frame(df)).to_json())
+
+    print(f"{len(df):,} rows, {df['Genre'].nunique()} genres, median of {args.repeat} runs")
+    print(f"{'case':<24}{'old ms':>12}{'new ms':>12}{'speedup':>10}")
+    for r in results:
+        print(f"{r['case']:<24}{r['old_ms']:>12.2f}{r['new_ms']:>12.2f}{r['speedup']:>9}x")
+    print(f"scatter payload: {old_payload / 1024:,.0f} KB -> {new_payload / 1024:,.0f} KB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "rows": len(df), "repeat": args.repeat, "results": results,
+                       "scatter_payload_bytes": {"old": old_payload, "new": new_payload}}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+OMNISCRAPER CLI:
+Headless batch sweeps for cron jobs and workers - no UI stack is imported.
+
+    python cli.py sweep --genres "Fiction,Mystery" --regions IN,USA -o ledger.parquet
+    python cli.py catalog --regions IN,UK,USA -o catalog.parquet
+    python cli.py verify --genres Fiction --regions IN,USA --fixtures -o live.csv
+    python cli.py import-time --record import_times.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+# What `streamlit run app.py` pulls in before the first paint, for comparison
+APP_STACK_IMPORT = "import streamlit, pandas, plotly.express, bs4, requests; from google import genai; import engine"
+
+
+def write_rows(rows, path, fmt):
+    if fmt == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    elif fmt == "csv":
+        fields = list(dict.fromkeys(key for row in rows for key in row))
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        import pandas as pd
+
+        pd.DataFrame(rows).to_parquet(path, index=False)
+
+
+def _parse_genres(args, parser):
+    import engine
+
+    genres = list(engine.GENRES) if args.genres == "all" else [g.strip() for g in args.genres.split(",")]
+    unknown = [g for g in genres if g not in engine.GENRES]
+    if unknown:
+        parser.error(f"unknown genres: {', '.join(unknown)}")
+    return genres
+
+
+def _parse_regions(args, parser):
+    import engine
+
+    codes = [c.strip().upper() for c in args.regions.split(",")]
+    if any(c not in engine.REGION_CODES for c in codes):
+        parser.error(f"regions must be drawn from {', '.join(engine.REGION_CODES)}")
+    return codes
+
+
+def _output_format(args, parser):
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error(f"cannot infer format from {args.output!r}; pass --format ({', '.join(FORMATS)})")
+    return fmt
+
+
+def cmd_sweep(args, parser):
+    import engine
+
+    genres = _parse_genres(args, parser)
+    codes = _parse_regions(args, parser)
+    fmt = _output_format(args, parser)
+
+    api_key = None if args.static else engine.GEMINI_API_KEY
+    batch_size = engine.BATCH_SIZE if args.batch_size is None else args.batch_size
+    derive = engine.DERIVE_PRICES if args.derive is None else args.derive
+    started = time.perf_counter()
+    rows = engine.sweep_protocol(api_key, genres, [engine.REGION_CODES[c] for c in codes], args.workers, batch_size, derive)
+    elapsed = time.perf_counter() - started
+
+    write_rows(rows, args.output, fmt)
+    static = sum(1 for row in rows if row["Source"] == "STATIC DB")
+    print(f"{len(rows)} rows ({static} static) from {len(genres) * len(codes)} segments "
+          f"in {elapsed:.2f}s -> {args.output}", file=sys.stderr)
+
+
+def cmd_catalog(args, parser):
+    import engine
+    import pandas as pd
+
+    codes = _parse_regions(args, parser)
+    fmt = _output_format(args, parser)
+
+    started = time.perf_counter()
+    catalog = engine.get_static_catalog()
+    frame = pd.concat([catalog.frame(code) for code in codes], ignore_index=True)
+    if fmt == "parquet":
+        frame.to_parquet(args.output, index=False)
+    else:
+        write_rows(frame.to_dict("records"), args.output, fmt)
+    print(f"{len(frame)} rows from a {len(catalog)}-title catalog in {time.perf_counter() - started:.2f}s "
+          f"-> {args.output}", file=sys.stderr)
+
+
+def cmd_verify(args, parser):
+    import engine
+    import fetcher
+
+    genres = _parse_genres(args, parser)
+    codes = _parse_regions(args, parser)
+    fmt = _output_format(args, parser)
+
+    rows = engine.sweep_protocol(None, genres, [engine.REGION_CODES[c] for c in codes], 1)
+
+    def run(proxy_base):
+        live = fetcher.LiveFetcher(args.workers, args.per_host, args.host_rps, proxy_base=proxy_base)
+        return live.verify(rows), live.stats()
+
+    if args.fixtures:
+        # Local stand-in marketplace: same fetch path, no network
+        with fetcher.FixtureServer() as server:
+            verified, stats = run(server.url)
+    else:
+        verified, stats = run(fetcher.LIVE_PROXY_BASE)
+
+    write_rows(verified, args.output, fmt)
+    print(f"{stats['pages']} pages at {stats['pages_per_sec']:.1f} pages/s, {stats['bytes'] / 1024:,.0f} KB, "
+          f"{stats['not_modified']} not modified, {stats['errors']} errors -> {args.output}", file=sys.stderr)
+
+
+def _cold_import(statement, runs):
+    """Median wall time of `statement` in fresh interpreters (no warm module cache)."""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        if out.returncode != 0:
+            return None
+        times.append(float(out.stdout.strip()))
+    return statistics.median(times)
+
+
+def cmd_import_time(args, parser):
+    result = {
+        "ts": time.time(),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "engine_s": _cold_import("import engine", args.runs),
+        # None when the UI dependencies are not installed in this environment
+        "app_stack_s": _cold_import(APP_STACK_IMPORT, args.runs),
+    }
+    if result["engine_s"] and result["app_stack_s"]:
+        result["ratio"] = round(result["app_stack_s"] / result["engine_s"], 1)
+    line = json.dumps(result)
+    print(line)
+    if args.record:
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="omniscraper", description="Headless OmniScraper engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sweep = sub.add_parser("sweep", help="fetch genres x regions and write one ledger file")
+    sweep.add_argument("--genres", default="all", help="comma-separated genre names, or 'all' (default)")
+    sweep.add_argument("--regions", default="IN,UK,USA", help="comma-separated region codes (default IN,UK,USA)")
+    sweep.add_argument("--workers", type=int, default=16, help="concurrent segment fetches (default 16)")
+    sweep.add_argument("--batch-size", type=int, help="genres per batched prompt (default OMNI_BATCH_SIZE)")
+    sweep.add_argument("--static", action="store_true", help="skip Gemini and use the static database only")
+    sweep.add_argument("--derive", action="store_true", default=None,
+                       help="fetch each genre once in USD and price other regions from the pricing table (default OMNI_DERIVE_PRICES)")
+    sweep.add_argument("--format", choices=FORMATS, help="output format (default: from the output suffix)")
+    sweep.add_argument("-o", "--output", required=True, help="output file")
+    sweep.set_defaults(run=cmd_sweep)
+
+    catalog = sub.add_parser("catalog", help="export the whole static catalog priced for each region")
+    catalog.add_argument("--regions", default="IN,UK,USA", help="comma-separated region codes (default IN,UK,USA)")
+    catalog.add_argument("--format", choices=FORMATS, help="output format (default: from the output suffix)")
+    catalog.add_argument("-o", "--output", required=True, help="output file")
+    catalog.set_defaults(run=cmd_catalog)
+
+    verify = sub.add_parser("verify", help="fetch the marketplace pages behind static rows and record their live prices")
+    verify.add_argument("--genres", default="all", help="comma-separated genre names, or 'all' (default)")
+    verify.add_argument("--regions", default="IN,UK,USA", help="comma-separated region codes (default IN,UK,USA)")
+    verify.add_argument("--workers", type=int, default=8, help="concurrent page fetches (default 8)")
+    verify.add_argument("--per-host", type=int, default=2, help="concurrent fetches per marketplace host (default 2)")
+    verify.add_argument("--host-rps", type=float, default=1.0, help="requests per second per marketplace host (default 1)")
+    verify.add_argument("--fixtures", action="store_true", help="serve the bundled fixture pages locally instead of the network")
+    verify.add_argument("--format", choices=FORMATS, help="output format (default: from the output suffix)")
+    verify.add_argument("-o", "--output", required=True, help="output file")
+    verify.set_defaults(run=cmd_verify)
+
+    imports = sub.add_parser("import-time", help="measure cold import time of the engine vs the full app stack")
+    imports.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement (default 5)")
+    imports.add_argument("--record", help="append the measurement as a JSON line to this file")
+    imports.set_defaults(run=cmd_import_time)
+
+    args = parser.parse_args(argv)
+    args.run(args, parser)
+
+
+if __name__ == "__main__":
+    main()
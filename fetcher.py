@@ -0,0 +1,241 @@
+"""
+OMNISCRAPER LIVE FETCHER:
+Optional live price verification against the marketplace search pages that
+get_market_links builds. One pooled keep-alive session, per-host concurrency
+and request-rate limits, ETag / Last-Modified revalidation and a pluggable
+parser per marketplace. FixtureServer is a local stand-in marketplace that
+serves fixture pages, so the whole stage can run without the network.
+"""
+import contextvars
+import functools
+import hashlib
+import os
+import re
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from engine import RateBudget, get_telemetry
+
+# Live verification limits (polite by default: marketplaces throttle aggressive crawlers)
+LIVE_WORKERS = int(os.getenv("OMNI_LIVE_WORKERS", "8"))
+LIVE_PER_HOST = int(os.getenv("OMNI_LIVE_PER_HOST", "2"))
+LIVE_HOST_RPS = float(os.getenv("OMNI_LIVE_HOST_RPS", "1"))
+# Route every marketplace URL through a stand-in server, e.g. http://127.0.0.1:8765
+LIVE_PROXY_BASE = os.getenv("OMNI_LIVE_PROXY_BASE")
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "marketplaces")
+
+_MONEY = re.compile(r"(?:₹|£|\$|Rs\.?)\s*([\d,]+(?:\.\d+)?)")
+
+# --- MARKETPLACE PARSERS ---
+# host fragment -> parser(soup) returning the first listed price, or None
+PARSERS = {}
+
+def register_parser(host_fragment):
+    def wrap(fn):
+        PARSERS[host_fragment] = fn
+        return fn
+    return wrap
+
+def _price(text):
+    match = _MONEY.search(text or "")
+    return float(match.group(1).replace(",", "")) if match else None
+
+@register_parser("amazon.")
+def parse_amazon(soup):
+    node = soup.select_one("span.a-price span.a-offscreen")
+    return _price(node.get_text()) if node else None
+
+@register_parser("ebay.")
+def parse_ebay(soup):
+    for node in soup.select(".s-item__price"):
+        price = _price(node.get_text())
+        if price is not None:
+            return price
+    return None
+
+@register_parser("flipkart.")
+def parse_flipkart(soup):
+    # Flipkart rotates its class names; the first rupee amount on a results page is the lead listing
+    return _price(soup.get_text(" "))
+
+def parser_for(host):
+    for fragment, parser in PARSERS.items():
+        if fragment in host:
+            return parser
+    return lambda soup: _price(soup.get_text(" "))
+
+class LiveFetcher:
+    """
+    POOLED LIVE FETCHER:
+    Concurrent page fetches over one keep-alive session. Each host gets its
+    own concurrency slots and request-rate budget; pages that answer 304 to
+    a conditional request reuse the price parsed last time.
+    """
+
+    def __init__(self, workers=8, per_host=2, per_host_rps=1.0, timeout=10, proxy_base=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.workers = workers
+        self.timeout = timeout
+        self.proxy_base = proxy_base.rstrip("/") if proxy_base else None
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Mozilla/5.0 (OmniScraper live verification)"
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(workers, 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.pages = self.bytes = self.not_modified = self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._slots = defaultdict(lambda: threading.BoundedSemaphore(per_host))
+        self._budgets = defaultdict(lambda: RateBudget(per_host_rps * 60))
+        self._validators = {}
+
+    def fetch(self, url):
+        """Live price listed at `url`, or None if the page failed or showed no price."""
+        from bs4 import BeautifulSoup
+
+        host = urllib.parse.urlsplit(url).hostname or ""
+        target = f"{self.proxy_base}/{host}{url.split(host, 1)[1]}" if self.proxy_base else url
+        with self._lock:
+            slot, budget = self._slots[host], self._budgets[host]
+            validator = self._validators.get(url)
+
+        headers = {}
+        if validator:
+            etag, modified, _ = validator
+            if etag:
+                headers["If-None-Match"] = etag
+            if modified:
+                headers["If-Modified-Since"] = modified
+
+        with slot, get_telemetry().span("live.fetch", host=host) as span:
+            budget.acquire()
+            try:
+                response = self.session.get(target, headers=headers, timeout=self.timeout)
+            except Exception:
+                span["status"] = "error"
+                with self._lock:
+                    self.errors += 1
+                return None
+            span["status"] = response.status_code
+
+        with self._lock:
+            self.pages += 1
+            self.bytes += len(response.content)
+        if response.status_code == 304 and validator:
+            with self._lock:
+                self.not_modified += 1
+            return validator[2]
+        if response.status_code != 200:
+            with self._lock:
+                self.errors += 1
+            return None
+
+        price = parser_for(host)(BeautifulSoup(response.text, "html.parser"))
+        if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+            with self._lock:
+                self._validators[url] = (response.headers.get("ETag"), response.headers.get("Last-Modified"), price)
+        return price
+
+    def verify(self, rows):
+        """Copies of `rows` with Live1/Live2: the price currently listed behind Link1/Link2."""
+        urls = list(dict.fromkeys(url for row in rows for url in (row["Link1"], row["Link2"])))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(urls) or 1)), thread_name_prefix="live") as pool:
+            # each task runs in a copy of the caller's context so live.fetch spans reach its Trace
+            futures = [pool.submit(contextvars.copy_context().run, self.fetch, url) for url in urls]
+            prices = {url: future.result() for url, future in zip(urls, futures)}
+        with self._lock:
+            self.busy_seconds += time.perf_counter() - started
+        return [dict(row, Live1=prices[row["Link1"]], Live2=prices[row["Link2"]]) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            rate = self.pages / self.busy_seconds if self.busy_seconds else 0.0
+            return {"pages": self.pages, "bytes": self.bytes, "pages_per_sec": rate,
+                    "not_modified": self.not_modified, "errors": self.errors}
+
+@functools.lru_cache(maxsize=None)
+def get_live_fetcher():
+    return LiveFetcher(LIVE_WORKERS, LIVE_PER_HOST, LIVE_HOST_RPS, proxy_base=LIVE_PROXY_BASE)
+
+# --- LOCAL STAND-IN MARKETPLACE ---
+class FixtureServer:
+    """
+    Serves fixtures/<host>.html for any /<host>/... path on 127.0.0.1, with
+    ETags and 304 revalidation, so the live stage can be exercised offline.
+    Each answer can be delayed by `latency` seconds; `peak` records the most
+    requests any one host had in flight at once.
+
+        with FixtureServer() as server:
+            LiveFetcher(proxy_base=server.url).verify(rows)
+    """
+
+    def __init__(self, directory=FIXTURES_DIR, port=0, latency=0.0):
+        self.peak = defaultdict(int)
+        in_flight = defaultdict(int)
+        lock = threading.Lock()
+        server = self
+        pages = {}
+        for name in os.listdir(directory):
+            if name.endswith(".html"):
+                with open(os.path.join(directory, name), "rb") as f:
+                    body = f.read()
+                pages[name[:-5]] = (body, '"' + hashlib.md5(body).hexdigest() + '"')
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so the client pool is exercised
+
+            def do_GET(self):
+                host = self.path.lstrip("/").split("/", 1)[0]
+                with lock:
+                    in_flight[host] += 1
+                    server.peak[host] = max(server.peak[host], in_flight[host])
+                try:
+                    time.sleep(latency)
+                    self._answer(host)
+                finally:
+                    with lock:
+                        in_flight[host] -= 1
+
+            def _answer(self, host):
+                page = pages.get(host) or pages.get(host.removeprefix("www."))
+                if page is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body, etag = page
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
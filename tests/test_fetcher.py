@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import get_market_links
+from fetcher import FIXTURES_DIR, FixtureServer, LiveFetcher
+
+
+def rows(region_code, count=1):
+    out = []
+    for i in range(count):
+        link1, link2, label1, label2 = get_market_links(f"Fixture Title {i}", region_code)
+        out.append({"Title": f"Fixture Title {i}", "Link1": link1, "Link2": link2, "Label1": label1, "Label2": label2})
+    return out
+
+
+def fetcher(server, **kw):
+    kw.setdefault("per_host_rps", 1000)
+    return LiveFetcher(proxy_base=server.url, **kw)
+
+
+def test_prices_are_parsed_per_marketplace():
+    with FixtureServer() as server:
+        live = fetcher(server)
+        checked = live.verify(rows("IN") + rows("UK") + rows("USA"))
+    # Amazon's first a-offscreen price, eBay's first non-empty listing, Flipkart's first rupee amount
+    assert [(row["Live1"], row["Live2"]) for row in checked] == [(499.0, 449.0), (8.99, 7.5), (14.99, 12.99)]
+    assert live.stats()["errors"] == 0
+
+
+def test_second_pass_revalidates_and_reuses_the_price():
+    with FixtureServer() as server:
+        live = fetcher(server)
+        first = live.verify(rows("UK"))
+        second = live.verify(rows("UK"))
+    assert second == first
+    assert live.stats()["not_modified"] == 2
+
+
+def test_stats_count_pages_and_bytes():
+    with FixtureServer() as server:
+        live = fetcher(server)
+        live.verify(rows("USA"))
+        live.verify(rows("USA"))
+    stats = live.stats()
+    # The 304s of the second pass count as pages but carry no body
+    assert stats["pages"] == 4
+    assert stats["bytes"] == sum(os.path.getsize(os.path.join(FIXTURES_DIR, name))
+                                 for name in ("amazon.com.html", "ebay.com.html"))
+
+
+def test_per_host_slots_cap_concurrency():
+    with FixtureServer(latency=0.05) as server:
+        fetcher(server, workers=8, per_host=2).verify(rows("IN", count=6))
+    assert server.peak["www.amazon.in"] == 2
+    assert server.peak["www.flipkart.com"] == 2
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MonteCarloForecaster
+
+
+def test_bands_do_not_depend_on_the_rest_of_the_batch():
+    together = MonteCarloForecaster(paths=500, seed=7).bands(["A", "B"], [10.0, 20.0], "IN")
+    alone = MonteCarloForecaster(paths=500, seed=7).bands(["B"], [20.0], "IN")
+    reordered = MonteCarloForecaster(paths=500, seed=7).bands(["B", "A"], [20.0, 10.0], "IN")
+    np.testing.assert_array_equal(together[1], alone[0])
+    np.testing.assert_array_equal(together, reordered[::-1])
+
+
+def test_seed_and_region_change_the_draw():
+    base = MonteCarloForecaster(paths=500, seed=7).bands(["A"], [10.0], "IN")
+    assert not np.array_equal(base, MonteCarloForecaster(paths=500, seed=8).bands(["A"], [10.0], "IN"))
+    assert not np.array_equal(base, MonteCarloForecaster(paths=500, seed=7).bands(["A"], [10.0], "UK"))
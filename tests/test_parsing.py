@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import GEMINI_MODELS, JsonArrayStream, _decode, _number, _validate_rows
+
+
+def test_number_repairs_near_misses():
+    assert _number("₹1,299") == 1299.0
+    assert _number("$14.99 ") == 14.99
+    assert _number(5) == 5.0
+    assert _number("n/a") is None
+    assert _number(True) is None
+
+
+def test_validate_rows_keeps_good_rows_and_drops_bad_ones():
+    rows, dropped, repaired = _validate_rows([
+        {"Title": "Good", "Price": 14.99, "Rating": 5},
+        {"Title": " Rupees ", "Price": "₹1,299", "Rating": "4"},
+        {"Title": "Bool rating", "Price": 10, "Rating": True},
+        {"Title": "Free", "Price": 0, "Rating": 3},
+        {"Title": "", "Price": 9.99, "Rating": 3},
+        "not a row",
+    ])
+    assert rows == [{"Title": "Good", "Price": 14.99, "Rating": 5}, {"Title": "Rupees", "Price": 1299.0, "Rating": 4}]
+    assert (dropped, repaired) == (4, 1)
+    assert _validate_rows({"Title": "Good"}) == ([], 1, 0)
+
+
+def test_stream_handles_fences_and_braces_inside_strings():
+    text = '```json\n[{"Title": "A {curly} \\"quoted\\" title", "Price": 1, "Rating": 5}, {"Title": "B", "Price": 2, "Rating": 4}]\n```'
+    parser = JsonArrayStream()
+    # Split mid-string and mid-escape, the way a stream can
+    items = []
+    for start, end in ((0, 21), (21, 31), (31, len(text))):
+        items.extend(parser.feed(text[start:end]))
+    assert [item["Title"] for item in items] == ['A {curly} "quoted" title', "B"]
+    assert parser.failures == 0
+
+
+def test_stream_skips_broken_objects_and_trailing_chatter():
+    parser = JsonArrayStream()
+    items = parser.feed('[{"Title": "A", "Price": 1}, {"Title": "B", "Price": }, {"Title": "C", "Price": 3}] see {"x": 1}')
+    assert [item["Title"] for item in items] == ["A", "C"]
+    assert parser.failures == 1
+
+
+def test_decode_salvages_the_rows_of_a_broken_array():
+    payload, broken = _decode(GEMINI_MODELS[0], '[{"Title": "A", "Price": 1, "Rating": 5}, {"Title": "B", "Price": 2,, "Rating": 4}]')
+    assert payload == [{"Title": "A", "Price": 1, "Rating": 5}]
+    assert broken == 1
+
+
+def test_decode_salvages_each_genre_of_a_broken_batch():
+    good = json.dumps({"Title": "A", "Rating": 5, "Price": {"IN": 499}})
+    text = '{"Fiction": [' + good + ', {"Title": "B",}], "Horror": [' + good + ']'
+    payload, broken = _decode(GEMINI_MODELS[0], text, ["Fiction", "Horror", "Poetry"])
+    assert payload == {"Fiction": [json.loads(good)], "Horror": [json.loads(good)]}
+    assert broken == 1
+
+
+def test_decode_raises_when_nothing_is_salvageable():
+    with pytest.raises(ValueError):
+        _decode(GEMINI_MODELS[0], "I could not find any books.")
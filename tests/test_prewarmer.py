@@ -0,0 +1,42 @@
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import engine
+from harness import MockGenai
+
+
+class CountingBudget(engine.RateBudget):
+    def __init__(self):
+        super().__init__(per_minute=60_000)
+        self.taken = 0
+        self._count_lock = threading.Lock()
+
+    def acquire(self):
+        with self._count_lock:
+            self.taken += 1
+        super().acquire()
+
+
+def test_budget_is_charged_for_every_gemini_attempt(tmp_path, monkeypatch):
+    # Every call answers 429, so the router retries both models pass after pass
+    mock = MockGenai(latency=0, jitter=0, rate_limit=1.0).install()
+    router = engine.ModelRouter(engine.GEMINI_MODELS, max_attempts=3, backoff_base=0.01, hedge=True)
+    monkeypatch.setattr(engine, "get_model_router", lambda: router)
+    try:
+        cache = engine.ResultCache(str(tmp_path / "cache.sqlite3"))
+        prewarmer = engine.Prewarmer("key", [], cache, engine.SingleFlight())
+        prewarmer._budget = budget = CountingBudget()
+        prewarmer.revalidate(("Fiction", "IN", "₹"))
+        prewarmer._urgent.shutdown(wait=True)
+    finally:
+        mock.uninstall()
+
+    calls = sum(mock.calls.values())
+    assert calls == 6
+    assert budget.taken == calls
+    assert prewarmer.failures == 1
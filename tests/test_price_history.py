@@ -0,0 +1,25 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import PriceHistory
+
+
+def test_series_reads_compacted_partition(tmp_path):
+    history = PriceHistory(str(tmp_path), compact_at=3)
+    rows = [{"Title": "Dune", "Price": 10.0, "Rating": 5}, {"Title": "Emma", "Price": 8.0, "Rating": 4}]
+    start = datetime.now().replace(hour=0, minute=0).timestamp()
+    for i in range(7):
+        history.append([dict(r, Price=r["Price"] + i) for r in rows], "Science Fiction", "USA", "GEMINI LIVE", ts=start + i)
+    history.flush()
+    assert history.failures == 0
+
+    folder = os.path.join(history._partition("USA", "Science Fiction"), f"date={datetime.now().date().isoformat()}")
+    assert len(os.listdir(folder)) < 7
+
+    frame = history.series("USA", "Science Fiction", ["Dune"], since=datetime.now() - timedelta(days=1))
+    assert list(frame.columns) == ["Title", "ObservedAt", "Price", "Source"]
+    assert len(frame) == 7
+    assert frame["Price"].tolist() == [10.0 + i for i in range(7)]
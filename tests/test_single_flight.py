@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import engine
+from harness import MockGenai
+
+SEGMENT = ("Fiction", "IN", "₹")
+ROWS = [{"Title": "Cached", "Price": 499.0, "Rating": 5}]
+
+
+@pytest.fixture
+def late_leader(tmp_path, monkeypatch):
+    """A session that missed the cache just before another one's flight stored the rows."""
+    cache = engine.ResultCache(str(tmp_path / "cache.sqlite3"))
+    cache.put(SEGMENT, engine.GEMINI_MODELS[0], ROWS)
+    monkeypatch.setattr(engine, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(engine, "get_single_flight", lambda: engine.SingleFlight())
+    monkeypatch.setattr(engine, "_lookup", lambda cache, segment: None)
+    mock = MockGenai(latency=0, jitter=0).install()
+    yield mock
+    mock.uninstall()
+
+
+def test_search_leader_settles_with_rows_cached_meanwhile(late_leader):
+    assert engine.gemini_search_protocol("key", *SEGMENT) == ROWS
+    assert not late_leader.calls
+
+
+def test_stream_leader_replays_rows_cached_meanwhile(late_leader):
+    assert list(engine.gemini_stream_protocol("key", *SEGMENT)) == ROWS
+    assert not late_leader.calls
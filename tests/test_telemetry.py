@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Telemetry, Trace
+
+
+def series(telemetry, name):
+    return [line for line in telemetry.prometheus().splitlines() if line.startswith(f'omniscraper_span_seconds_count{{span="{name}"')]
+
+
+def test_free_form_fields_do_not_split_series(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    telemetry = Telemetry(str(path))
+    with Trace() as trace:
+        for rows in (1, 6, 9, 30, 5000):
+            with telemetry.span("dataframe.build", rows=rows):
+                pass
+        with telemetry.span("sweep", workers=64, batch=5):
+            pass
+    telemetry.flush()
+
+    assert series(telemetry, "dataframe.build") == ['omniscraper_span_seconds_count{span="dataframe.build"} 5']
+    assert len(series(telemetry, "sweep")) == 1
+    # Attributes still reach the trace and the span log
+    assert [span["rows"] for span in trace.spans[:5]] == [1, 6, 9, 30, 5000]
+    logged = [json.loads(line) for line in path.read_text().splitlines()]
+    assert logged[-1]["workers"] == 64 and logged[-1]["batch"] == 5
+
+
+def test_fixed_labels_split_series():
+    telemetry = Telemetry()
+    for outcome in ("ok", "429", "ok"):
+        with telemetry.span("gemini.call", model="gemini-2.5-flash") as span:
+            span["outcome"] = outcome
+    lines = series(telemetry, "gemini.call")
+    assert len(lines) == 2
+    assert 'omniscraper_span_seconds_count{span="gemini.call",model="gemini-2.5-flash",outcome="ok"} 2' in lines
+
+
+def test_hub_page_size_is_an_attribute():
+    # app.py's marketplace_hub tags its render with the shown page's row count
+    telemetry = Telemetry()
+    with Trace() as trace:
+        for shown in (9, 9, 3):
+            with telemetry.span("cards.render", tab="hub", rows=shown):
+                pass
+    assert series(telemetry, "cards.render") == ['omniscraper_span_seconds_count{span="cards.render",tab="hub"} 3']
+    assert [span["rows"] for span in trace.spans] == [9, 9, 3]
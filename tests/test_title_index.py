@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import TitleIndex, get_static_catalog
+
+
+def catalog_index():
+    catalog = get_static_catalog()
+    index = TitleIndex()
+    index.add_catalog(catalog.titles.tolist(), catalog.genres.tolist(), catalog.base_usd.tolist(), catalog.title_ratings())
+    return index
+
+
+def test_catalog_matches_carry_a_fixed_rating():
+    index = catalog_index()
+    first = index.search("midnight library", "IN")[0]
+    assert first["Title"] == "The Midnight Library" and first["Source"] == "STATIC DB"
+    assert first["Rating"] in (4, 5)
+    assert catalog_index().search("midnight library", "UK")[0]["Rating"] == first["Rating"]
+
+
+def test_fetched_rating_wins_over_the_catalog():
+    index = catalog_index()
+    index.add([{"Title": "The Midnight Library", "Price": 520.0, "Rating": 3}], "Fiction", "IN")
+    assert index.search("midnight library", "IN")[0]["Rating"] == 3
+    # Another node still reuses the fetched rating
+    assert index.search("midnight library", "UK")[0]["Rating"] == 3